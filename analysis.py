@@ -0,0 +1,64 @@
+import functools
+import json
+import numpy as np
+import pandas as pd
+from scipy.stats import skellam
+
+# Leverage model and per-player metrics; evaluated offline by prebuild.py into the player_stats table
+
+MAX_POSSESSIONS = 720 // 13  # a full 12-minute quarter
+MAX_MARGIN = 40  # a free throw's leverage is below 1e-4 beyond this
+CLUTCH_LEVERAGE = 0.15
+
+@functools.lru_cache(maxsize=None)
+def leverage_table():
+    # Each side scores Poisson(1.08) per possession, so the final differential D is Skellam(mu, mu).
+    # A free throw's leverage is P(win | make) - P(win | miss) = P(D = -margin), so one pmf value
+    # covers both outcomes. Only ~55 possession counts x ~80 margins ever occur, so evaluate them
+    # all once and index into it. Row 0 is an expired clock.
+    margins = np.arange(-MAX_MARGIN, MAX_MARGIN + 1)
+    mu = 1.08 * np.arange(1, MAX_POSSESSIONS + 1)[:, None]
+    table = np.empty((MAX_POSSESSIONS + 1, len(margins)))
+    table[0] = np.where((margins == 0) | (margins == -1), 0.5, 0.0)
+    table[1:] = skellam.pmf(-margins, mu, mu)
+    table.setflags(write=False)
+    return table
+
+def leverage_lookup(margins, possessions):
+    # Games beyond +/-MAX_MARGIN are decided, so those free throws carry no leverage
+    leverage = leverage_table()[possessions, np.clip(margins + MAX_MARGIN, 0, 2 * MAX_MARGIN)]
+    return np.where(np.abs(margins) <= MAX_MARGIN, leverage, 0.0)
+
+def process_player_shots(df):
+    # df holds one player's player_ft_shots rows (period, margin, total_sec, is_make)
+    # Leverage only depends on the possessions left (0 once the clock has expired), not the exact second
+    seconds_left = df['total_sec'].to_numpy()
+    possessions = np.where(seconds_left <= 0, 0, np.clip(seconds_left // 13, 1, MAX_POSSESSIONS))
+    leverage = leverage_lookup(df['margin'].to_numpy(), possessions).astype(np.float32)
+    return pd.DataFrame({
+        'is_make': df['is_make'].to_numpy(np.int8),
+        'weight': np.sqrt(leverage) + np.float32(0.05),
+        'leverage': leverage,
+        'period': df['period'].to_numpy(np.int8),
+    })
+
+def summarize_player(res_df):
+    raw_avg = res_df['is_make'].mean() * 100
+    pressure_avg = (res_df['is_make'] * res_df['weight']).sum() / res_df['weight'].sum() * 100
+    clutch_pct = res_df[res_df['leverage'] > CLUTCH_LEVERAGE]['is_make'].mean() * 100
+
+    # Overtime periods fold into "4+"; quarters with no attempts are dropped
+    quarter = res_df['period'].to_numpy().astype(int).clip(1, 4)
+    makes = np.bincount(quarter, weights=res_df['is_make'].to_numpy(), minlength=5)[1:]
+    attempts = np.bincount(quarter, minlength=5)[1:]
+    quarterly = [
+        {'Quarter': label, 'Make %': round(float(m / a * 100), 1)}
+        for label, m, a in zip(["1", "2", "3", "4+"], makes, attempts) if a > 0
+    ]
+    return {
+        'attempts': len(res_df),
+        'raw': float(raw_avg),
+        'pressure': float(pressure_avg),
+        'clutch': None if np.isnan(clutch_pct) else float(clutch_pct),
+        'quarterly_json': json.dumps(quarterly),
+    }
@@ -1,11 +1,12 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
-import numpy as np
 import os
 import shutil
+import json
 import altair as alt
 from huggingface_hub import hf_hub_download
+from prebuild import prepare_database, is_prepared
 
 # --- PAGE SETUP ---
 st.set_page_config(page_title="NBA True FT% Analysis", layout="wide")
@@ -55,6 +56,7 @@ st.markdown("""
 # --- CONFIGURATION ---
 REPO_ID = "qpmulho/nba-data-repo" 
 DB_FILENAME = "nba.sqlite"
+PLAYERS_FILENAME = "players.parquet"
 
 @st.cache_resource(show_spinner=False)
 def get_connection():
@@ -68,98 +70,84 @@ def get_connection():
             st.error(f"Failed to download: {e}")
             return None
     
-    conn = sqlite3.connect(db_path, check_same_thread=False)
-    try:
-        # This specific index targets the relationship between players and their shots
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_pbp_player1_id ON play_by_play(player1_id);")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_player_full_name ON player(full_name);")
-        conn.commit()
-    except:
-        pass
+    if not is_database_prepared(db_path):
+        # Databases that were not prepared offline get the derived tables built once here
+        with st.spinner("Preparing database..."):
+            prepare_database(db_path)
+
+    # The file never changes after preparation, so open it read-only and let SQLite memory-map it
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-200000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA query_only=1")
     return conn
 
-# NEW: Optimized Player List Caching
-@st.cache_data(show_spinner=False)
-def get_player_list(_conn):
-    return pd.read_sql("SELECT DISTINCT full_name FROM player ORDER BY full_name", _conn)
+def is_database_prepared(db_path):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return is_prepared(conn)
+    finally:
+        conn.close()
+
+def require_connection():
+    conn = get_connection()
+    if conn is None:
+        # Don't keep the failed download cached; the next rerun retries it
+        get_connection.clear()
+        st.stop()
+    return conn
 
-def simulate_game_win_fast(margin, seconds_left, trials=10000):
-    if seconds_left <= 0:
-        return 1.0 if margin > 0 else (0.5 if margin == 0 else 0.0)
-    possessions = max(1, int(seconds_left / 13))
-    team_a_pts = np.random.poisson(1.08, (trials, possessions)).sum(axis=1)
-    team_b_pts = np.random.poisson(1.08, (trials, possessions)).sum(axis=1)
-    return np.mean((margin + team_a_pts - team_b_pts) > 0)
+# The roster is static, so keep it in a tiny parquet file and only open the database the first time
+@st.cache_data(persist="disk", show_spinner=False)
+def get_player_list():
+    players_path = os.path.join(os.getcwd(), PLAYERS_FILENAME)
+    if os.path.exists(players_path):
+        return pd.read_parquet(players_path)
+    df = pd.read_sql("SELECT DISTINCT full_name FROM player ORDER BY full_name", require_connection())
+    df.to_parquet(players_path, index=False)
+    return df
 
 @st.cache_data(show_spinner=False)
-def get_processed_player_data(selected_player, _conn):
-    query = """
-    SELECT period, scoremargin, pctimestring, homedescription, visitordescription
-    FROM play_by_play pbp
-    JOIN player p ON pbp.player1_id = p.id
-    WHERE p.full_name = ? 
-    AND (homedescription LIKE '%Free Throw%' OR visitordescription LIKE '%Free Throw%')
-    """
-    df = pd.read_sql(query, _conn, params=[selected_player])
-    if df.empty: return None
-
-    results = []
-    for _, row in df.iterrows():
-        try:
-            m_str = str(row['scoremargin']).upper()
-            margin = 0 if any(x in m_str for x in ['TIE', 'NONE', 'NAN']) else int(m_str)
-            t_parts = row['pctimestring'].split(':')
-            total_sec = int(t_parts[0]) * 60 + int(t_parts[1])
-            is_make = 0 if "MISS" in (str(row['homedescription']) + str(row['visitordescription'])).upper() else 1
-            wp_make = simulate_game_win_fast(margin + 1, total_sec)
-            wp_miss = simulate_game_win_fast(margin, total_sec)
-            leverage = abs(wp_make - wp_miss)
-            results.append({'is_make': is_make, 'weight': np.sqrt(leverage) + 0.05, 'leverage': leverage, 'period': row['period']})
-        except: continue
-    return pd.DataFrame(results)
+def get_player_stats(selected_player):
+    # Metrics are precomputed per player by prebuild.py, so this is a single primary-key lookup
+    query = "SELECT attempts, raw, pressure, clutch, quarterly_json FROM player_stats WHERE full_name = ?"
+    df = pd.read_sql(query, get_connection(), params=[selected_player], dtype={'clutch': float})
+    return None if df.empty else df.iloc[0]
 
 # --- APP INTERFACE ---
-conn = get_connection()
-
-if conn:
-    # UPDATED: Using the cached list for speed
-    player_data = get_player_list(conn)
-    
-    selected_player = st.sidebar.selectbox(
-        "Select Player", 
-        player_data['full_name'], 
-        index=None, 
-        placeholder="Choose a player..."
-    )
-
-    if selected_player:
-        with st.spinner(f"Retrieving statistics for {selected_player}..."):
-            res_df = get_processed_player_data(selected_player, conn)
-
-        if res_df is not None and not res_df.empty:
-            raw_avg = res_df['is_make'].mean() * 100
-            pressure_avg = (res_df['is_make'] * res_df['weight']).sum() / res_df['weight'].sum() * 100
-            clutch_pct = res_df[res_df['leverage'] > 0.15]['is_make'].mean() * 100
-
-            c1, c2, c3 = st.columns(3)
-            c1.metric("Raw FT%", f"{raw_avg:.1f}%")
-            c2.metric("Pressure-Adjusted FT%", f"{pressure_avg:.1f}%", f"{pressure_avg - raw_avg:+.1f}%")
-            c3.metric("True Clutch (>15% Win Probability Swing) FT%", f"{clutch_pct:.1f}%")
-
-            st.subheader("Accuracy by Quarter")
-            chart_data = res_df.copy()
-            chart_data['Quarter'] = chart_data['period'].apply(lambda x: str(int(x)) if x < 4 else "4+")
-            final_chart = chart_data.groupby('Quarter')['is_make'].mean().reset_index()
-            final_chart['Make %'] = (final_chart['is_make'] * 100).round(1)
-            
-            bars = alt.Chart(final_chart).mark_bar(color='#60b4ff').encode(
-                x=alt.X('Quarter:N', sort=["1", "2", "3", "4+"], axis=alt.Axis(labelAngle=0)),
-                y=alt.Y('Make %:Q', title="Make %"),
-                tooltip=['Quarter', 'Make %']
-            ).properties(height=400)
-
-            st.altair_chart(bars, use_container_width=True)
-        else:
-            st.warning(f"No free throw data found for {selected_player}.")
+# The sidebar comes from the cached player list; the database is only opened once a player is picked
+player_data = get_player_list()
+
+selected_player = st.sidebar.selectbox(
+    "Select Player", 
+    player_data['full_name'], 
+    index=None, 
+    placeholder="Choose a player..."
+)
+
+if selected_player:
+    # The sidebar can render from players.parquet alone, so the database may still be unavailable here
+    require_connection()
+    stats = get_player_stats(selected_player)
+
+    if stats is not None:
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Raw FT%", f"{stats['raw']:.1f}%")
+        c2.metric("Pressure-Adjusted FT%", f"{stats['pressure']:.1f}%", f"{stats['pressure'] - stats['raw']:+.1f}%")
+        c3.metric("True Clutch (>15% Win Probability Swing) FT%", f"{stats['clutch']:.1f}%")
+
+        st.subheader("Accuracy by Quarter")
+        final_chart = pd.DataFrame(json.loads(stats['quarterly_json']))
+        
+        bars = alt.Chart(final_chart).mark_bar(color='#60b4ff').encode(
+            x=alt.X('Quarter:N', sort=["1", "2", "3", "4+"], axis=alt.Axis(labelAngle=0)),
+            y=alt.Y('Make %:Q', title="Make %"),
+            tooltip=['Quarter', 'Make %']
+        ).properties(height=400)
+
+        st.altair_chart(bars, use_container_width=True)
     else:
-        st.info("Select a player from the sidebar to view their Pressure-Adjusted statistics.")
\ No newline at end of file
+        st.warning(f"No free throw data found for {selected_player}.")
+else:
+    st.info("Select a player from the sidebar to view their Pressure-Adjusted statistics.")
\ No newline at end of file
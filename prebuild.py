@@ -0,0 +1,69 @@
+import sqlite3
+import sys
+
+# Offline preparation of nba.sqlite: builds the derived tables and indexes the app reads.
+# Run once before uploading the database (python prebuild.py nba.sqlite); the app opens it read-only.
+
+# Bump whenever the derived tables change so existing databases get rebuilt
+SCHEMA_VERSION = 3
+
+def is_prepared(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+def prepare_database(db_path):
+    conn = sqlite3.connect(db_path)
+    if is_prepared(conn):
+        conn.close()
+        return
+    conn.execute("DROP TABLE IF EXISTS player_stats;")
+    conn.execute("DROP TABLE IF EXISTS player_ft_shots;")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_player_full_name ON player(full_name);")
+    # The DB is static, so parse every free throw once into a narrow per-player table
+    conn.execute("""
+    CREATE TABLE player_ft_shots AS
+    SELECT p.full_name, pbp.period,
+        CASE WHEN scoremargin IS NULL OR upper(scoremargin) IN ('TIE', 'NONE', 'NAN') THEN 0
+             ELSE CAST(scoremargin AS INTEGER) END AS margin,
+        CAST(substr(pctimestring, 1, instr(pctimestring, ':') - 1) AS INTEGER) * 60
+            + CAST(substr(pctimestring, instr(pctimestring, ':') + 1) AS INTEGER) AS total_sec,
+        CASE WHEN upper(coalesce(homedescription, '') || coalesce(visitordescription, '')) LIKE '%MISS%'
+             THEN 0 ELSE 1 END AS is_make
+    FROM play_by_play pbp
+    JOIN player p ON pbp.player1_id = p.id
+    WHERE (homedescription LIKE '%Free Throw%' OR visitordescription LIKE '%Free Throw%')
+    -- Malformed clocks and margins would otherwise CAST silently to 0, so keep well-formed rows only
+    AND pctimestring GLOB '[0-9]*:[0-9]*' AND pctimestring NOT GLOB '*[^0-9:]*' AND pctimestring NOT GLOB '*:*:*'
+    AND (scoremargin IS NULL OR upper(scoremargin) IN ('TIE', 'NONE', 'NAN')
+         OR ((scoremargin GLOB '[0-9]*' OR scoremargin GLOB '-[0-9]*') AND substr(scoremargin, 2) NOT GLOB '*[^0-9]*'));
+    """)
+    conn.execute("CREATE INDEX idx_pfs_name ON player_ft_shots(full_name);")
+    build_player_stats(conn)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+    conn.close()
+
+def build_player_stats(conn):
+    # Every metric the app shows, precomputed per player so a page view is a single row fetch
+    # Imported here so the app can check is_prepared() on startup without loading pandas/scipy
+    import pandas as pd
+    from analysis import process_player_shots, summarize_player
+
+    shots = pd.read_sql("SELECT full_name, period, margin, total_sec, is_make FROM player_ft_shots", conn)
+    rows = []
+    for full_name, df in shots.groupby('full_name', sort=False):
+        stats = summarize_player(process_player_shots(df))
+        rows.append((full_name, stats['attempts'], stats['raw'], stats['pressure'], stats['clutch'], stats['quarterly_json']))
+    conn.execute("""
+    CREATE TABLE player_stats (
+        full_name TEXT PRIMARY KEY,
+        attempts INTEGER,
+        raw REAL,
+        pressure REAL,
+        clutch REAL,
+        quarterly_json TEXT
+    );
+    """)
+    conn.executemany("INSERT INTO player_stats VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+if __name__ == "__main__":
+    prepare_database(sys.argv[1] if len(sys.argv) > 1 else "nba.sqlite")